@@ -2,19 +2,23 @@
 Common utilities and types used across the project.
 """
 from __future__ import annotations
-import hashlib, json, pathlib, time, httpx
-from dataclasses import dataclass, asdict
-from typing import Any, Dict, Iterable, Optional
+import asyncio, hashlib, json, logging, orjson, pathlib, time, httpx
+from dataclasses import dataclass
+from typing import Any, Coroutine, Dict, Iterable, Optional
 
 DATA_DIR = pathlib.Path("data")
 RUNS_DIR = DATA_DIR / "runs"
 SUMMARIES_DIR = DATA_DIR / "summaries"
 REPORTS_DIR = pathlib.Path("reports")
 
+# exposure_flags values the summaries count
+ANON_FLAG = "anonymous_access"
+DANGEROUS_FLAG = "dangerous_tools"
+
 DEFAULT_TIMEOUT = 10.0  # seconds
 USER_AGENT = "mcp-server-trends/0.1 (+https://github.com/phunold/MCP-server-trends)"
-HTTPX_LIMITS = httpx.Limits(max_connections=5000, max_keepalive_connections=1000)
 HTTPX_TIMEOUT = httpx.Timeout(connect=4.0, read=4.0, write=4.0, pool=4.0)
+KEEPALIVE_EXPIRY = 30.0  # seconds
 
 def ensure_dir(p: pathlib.Path) -> None:
     p.mkdir(parents=True, exist_ok=True)
@@ -23,21 +27,100 @@ def now_iso() -> str:
     # UTC ISO8601 zulu
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
+def scan_client(concurrency: int, headers: Optional[Dict[str, str]] = None) -> httpx.AsyncClient:
+    """AsyncClient shared by the scanners: HTTP/1.1, no retries, pool sized to the scan concurrency.
+
+    Limits go on the transport itself; httpx ignores client-level limits/http2 once a
+    custom transport is passed. h2 buys nothing when almost every host is hit once.
+    """
+    limits = httpx.Limits(
+        max_connections=concurrency,
+        max_keepalive_connections=concurrency,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        transport=httpx.AsyncHTTPTransport(retries=0, http2=False, limits=limits),
+        headers={"User-Agent": USER_AGENT, **(headers or {})},
+        follow_redirects=True,
+        timeout=HTTPX_TIMEOUT,
+    )
+
+def run_async(coro: Coroutine) -> Any:
+    """asyncio.run() on uvloop when it is installed, else on the stock event loop."""
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.run(coro)
+    return asyncio.run(coro, loop_factory=uvloop.new_event_loop)
+
 def sha256_bytes(b: bytes) -> str:
     return hashlib.sha256(b).hexdigest()
 
-def write_jsonl(path: pathlib.Path, rows: Iterable[Dict[str, Any]]) -> None:
+def encode_row(r: Dict[str, Any] | ScanResult) -> bytes:
+    """One JSONL line for r. orjson serializes dataclasses natively, so ScanResult rows need
+    no asdict() first; rows it refuses (e.g. manifests nested past its 254-level limit, which
+    orjson.loads still accepts) fall back to json.dumps."""
+    try:
+        return orjson.dumps(r) + b"\n"
+    except TypeError:
+        if isinstance(r, ScanResult):
+            r = r.asdict()
+        return (json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8")
+
+def write_jsonl(path: pathlib.Path, rows: Iterable[Dict[str, Any] | ScanResult]) -> None:
+    # the batch is encoded to bytes up front and appended with a single write
+    _append(path, b"".join(encode_row(r) for r in rows))
+
+def _append(path: pathlib.Path, buf: bytes) -> None:
     ensure_dir(path.parent)
-    with path.open("a", encoding="utf-8") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    with path.open("ab") as f:
+        f.write(buf)
+
+async def jsonl_writer(path: pathlib.Path, q: asyncio.Queue, flush_every: int = 1000) -> None:
+    """Append rows from q to path as they arrive, until a None sentinel is received.
+
+    Rows are written whenever the queue runs dry or flush_every rows have piled up, so a
+    slow scan never holds back rows that are already done.
+    """
+    batch: list[bytes] = []
+    while (row := await q.get()) is not None:
+        try:
+            batch.append(encode_row(row))
+        except (TypeError, ValueError, RecursionError) as e:
+            # one unencodable response must not cost the run; only I/O errors stop the writer
+            logging.warning(f"Skipping unencodable row for {_row_domain(row)}: {e!r}")
+        if batch and (len(batch) >= flush_every or q.empty()):
+            _append(path, b"".join(batch))
+            batch.clear()
+    if batch:
+        _append(path, b"".join(batch))
+
+def _row_domain(row: Any) -> Any:
+    return row.get("domain") if isinstance(row, dict) else getattr(row, "domain", None)
+
+async def put_row(q: asyncio.Queue, row: Any, writer: asyncio.Task) -> None:
+    """q.put(row) for a jsonl_writer queue that raises, rather than blocking forever,
+    once the writer task has died (disk full, bad path, ...); rows the writer cannot
+    encode are logged and skipped there, so they never abort the scan."""
+    if not writer.done():
+        try:
+            q.put_nowait(row)
+            return
+        except asyncio.QueueFull:
+            put = asyncio.ensure_future(q.put(row))
+            await asyncio.wait({put, writer}, return_when=asyncio.FIRST_COMPLETED)
+            if put.done():
+                return
+            put.cancel()
+    writer.result()  # re-raises the writer's error
+    raise RuntimeError("jsonl writer stopped before the end of the scan")
 
 def read_jsonl(path: pathlib.Path) -> Iterable[Dict[str, Any]]:
     with path.open("r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if line:
-                yield json.loads(line)
+                yield orjson.loads(line)
 
 @dataclass
 class ScanResult:
@@ -56,4 +139,5 @@ class ScanResult:
     notes: Optional[list[str]] = None
 
     def asdict(self) -> Dict[str, Any]:
-        return asdict(self)
\ No newline at end of file
+        # fields are flat JSON values; a shallow copy avoids dataclasses.asdict's recursive deepcopy
+        return dict(self.__dict__)
\ No newline at end of file
@@ -1,74 +1,164 @@
 from __future__ import annotations
-import json, pathlib, pandas as pd
+import os, pathlib, tempfile, numpy as np, orjson, pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa, pyarrow.compute as pc, pyarrow.json as paj
 import streamlit as st
 from .privacy import sanitize_df
 
 DATA_BASE = pathlib.Path(__file__).resolve().parents[1] / ".." / "data" / "runs"
 
-@st.cache_data(show_spinner=False)
-def load_scans(data_base: str | pathlib.Path = DATA_BASE, sanitized: bool = True) -> pd.DataFrame:
+def _read_run(scan_file: pathlib.Path) -> pd.DataFrame:
+    """Raw rows of one run, served from a sibling Parquet cache while it is fresh."""
+    cache_file = scan_file.with_suffix(".parquet")
+    if cache_file.exists() and cache_file.stat().st_mtime >= scan_file.stat().st_mtime:
+        try:
+            return pd.read_parquet(cache_file)
+        except (pa.ArrowException, OSError):
+            pass  # unreadable cache (e.g. left by an older, interrupted write): rebuild it below
+
+    try:
+        # Arrow parses the whole file in C, skipping the list-of-dicts stage
+        df = paj.read_json(scan_file).to_pandas()
+    except pa.ArrowException:
+        # malformed line somewhere: fall back to per-line parsing and skip bad rows
+        records = []
+        with scan_file.open("rb") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    continue
+        df = pd.DataFrame(records)
+
+    if not df.empty:
+        tmp = None
+        try:
+            # write beside the cache and swap it in, so readers never see a half-written file
+            fd, tmp = tempfile.mkstemp(dir=cache_file.parent, prefix=cache_file.name, suffix=".tmp")
+            os.close(fd)
+            df.to_parquet(tmp, compression="zstd")
+            os.replace(tmp, cache_file)
+        except Exception:
+            # best effort: odd manifest shapes or a read-only data dir just skip the cache
+            if tmp:
+                pathlib.Path(tmp).unlink(missing_ok=True)
+    return df
+
+@st.cache_resource(show_spinner=False)
+def _tld_cache() -> dict[str, str]:
+    """Process-wide domain -> TLD memo; the same Tranco domains recur run after run."""
+    return {}
+
+# Short TTL so newly landed run directories show up without a restart; an empty result
+# (nothing on disk yet) is never served from cache
+@st.cache_resource(show_spinner=False, ttl="5m", max_entries=4, validate=lambda df: not df.empty)
+def _load_scans_raw(data_base: str | pathlib.Path = DATA_BASE, sanitized: bool = True) -> pd.DataFrame:
+    """Full scan frame, shared by every page and session without copying.
+
+    Never mutate the returned frame; go through load_scans() for a private copy.
+    """
     base = pathlib.Path(data_base)
     if not base.exists():
         return pd.DataFrame()
 
-    records = []
-    for run_dir in sorted(base.glob("*")):
-        scan_file = run_dir / "scan_results.jsonl"
-        if scan_file.exists():
-            with scan_file.open("r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        records.append(json.loads(line))
-                    except json.JSONDecodeError:
-                        continue
-
-    if not records:
+    scan_files = [f for f in (d / "scan_results.jsonl" for d in sorted(base.glob("*"))) if f.exists()]
+    # Runs are independent and Arrow/Parquet release the GIL, so read them side by side
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        frames = [f for f in ex.map(_read_run, scan_files) if not f.empty]
+
+    if not frames:
         return pd.DataFrame()
 
-    df = pd.DataFrame(records)
+    df = pd.concat(frames, ignore_index=True)
 
     # Types & derived columns
     if "run_ts" in df.columns:
-        df["run_ts"] = pd.to_datetime(df["run_ts"], errors="coerce", utc=True)
+        # run_ts is always ISO8601 (now_iso() emits Zulu seconds), so skip per-value format inference
+        df["run_ts"] = pd.to_datetime(df["run_ts"], format="ISO8601", errors="coerce", utc=True)
         df["run_date"] = df["run_ts"].dt.date
 
     for c in ["status", "bytes", "ttfb_ms", "total_ms"]:
         if c in df.columns:
             df[c] = pd.to_numeric(df[c], errors="coerce")
 
-    for list_col in ["exposure_flags", "notes", "manifest_caps"]:
-        if list_col in df.columns:
-            df[list_col] = df[list_col].apply(lambda x: tuple(x) if isinstance(x, list) else ())
-
-    # Outcome bucket
-    def classify(row):
-        s = row.get("status")
-        has = bool(row.get("has_manifest"))
-        if has and s == 200: return "detected"
-        if s in (401, 402, 403): return "blocked"
-        if s in (404, 410): return "absent"
-        if s == 0 or pd.isna(s) or (isinstance(s, (int, float)) and s >= 500): return "error"
-        return "other"
-    df["outcome"] = df.apply(classify, axis=1)
-
-    # TLD bucket (non-identifying)
-    if "domain" in df.columns:
-        df["tld"] = df["domain"].astype(str).str.rsplit(".", n=1).str[-1]
+    if "has_manifest" in df.columns:
+        df["has_manifest"] = df["has_manifest"].astype("boolean").fillna(False).astype(bool)
 
-    if sanitized:
-        df = sanitize_df(df)
+    # Outcome bucket (vectorized; first matching condition wins)
+    s = df["status"] if "status" in df.columns else pd.Series(np.nan, index=df.index)
+    has = df["has_manifest"] if "has_manifest" in df.columns else pd.Series(False, index=df.index)
+    conds = [
+        has & (s == 200),
+        s.isin([401, 402, 403]),
+        s.isin([404, 410]),
+        s.isna() | (s == 0) | (s >= 500),
+    ]
+    choices = ["detected", "blocked", "absent", "error"]
+    df["outcome"] = np.select(conds, choices, default="other")
 
-    # Keep only safe columns
+    # TLD bucket (non-identifying); split each distinct domain once per process
+    if "domain" in df.columns:
+        df["domain"] = df["domain"].astype("string[pyarrow]")
+        tlds = _tld_cache()
+        for d in df["domain"].dropna().unique():
+            if d not in tlds:
+                tlds[d] = d.rpartition(".")[2]
+        df["tld"] = df["domain"].map(tlds)
+
+    # Keep only safe columns; projecting first means sanitize_df only scans what survives
     keep = [c for c in df.columns if c in {
         "run_ts","run_date","seed_source","status","has_manifest","bytes","ttfb_ms","total_ms",
         "auth","tls_grade","exposure_flags","manifest_caps","outcome","tld"
     }]
-    return df[keep]
+    df = df[keep]
+
+    # List columns as contiguous Arrow ListArrays rather than per-row Python tuples
+    for list_col in ["exposure_flags", "manifest_caps"]:
+        if list_col in df.columns:
+            try:
+                # infer first so stray strings fail instead of being split into characters
+                values = pa.array(df[list_col], from_pandas=True).cast(pa.list_(pa.string()))
+            except (pa.ArrowException, TypeError):
+                # malformed cells: keep the str items of real lists (Parquet hands them back
+                # as numpy arrays), null anything that isn't a list
+                values = pa.array(
+                    df[list_col].map(lambda x: [v for v in x if isinstance(v, str)]
+                                     if isinstance(x, (list, tuple, np.ndarray)) else None),
+                    type=pa.list_(pa.string()), from_pandas=True)
+            df = df.assign(**{list_col: pd.Series(pd.arrays.ArrowExtensionArray(values), index=df.index)})
+
+    if sanitized:
+        df = sanitize_df(df)
+
+    # Compact dtypes: low-cardinality labels as categories, HTTP status as a nullable small int
+    dtypes = {c: "category" for c in ["seed_source","auth","tls_grade","outcome","tld"] if c in keep}
+    if "status" in keep:
+        dtypes["status"] = pd.Int16Dtype()
+    return df.astype(dtypes)
+
+@st.cache_data(show_spinner=False, ttl="5m", max_entries=8)
+def load_scans(data_base: str | pathlib.Path = DATA_BASE, sanitized: bool = True,
+               columns: tuple[str, ...] | None = None) -> pd.DataFrame:
+    """Scan frame for a page, optionally projected to the columns it needs."""
+    df = _load_scans_raw(data_base, sanitized)
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
 
 # Aggregation helpers (safe)
+# Charts are fed these small aggregates rather than per-row frames: st.altair_chart ships
+# every dataset to the browser as-is (it installs its own Arrow data transformer), so
+# shrinking the data server-side is what keeps page payloads small.
+# Cache key for page frames: row count plus newest run timestamp instead of hashing every cell
+def _frame_key(df: pd.DataFrame) -> tuple:
+    return len(df), tuple(df.columns), (df["run_ts"].max() if "run_ts" in df.columns else None)
+
+_agg_cache = st.cache_data(show_spinner=False, max_entries=8, hash_funcs={pd.DataFrame: _frame_key})
+
+@_agg_cache
 def adoption_by_date(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty or "run_date" not in df.columns:
         return pd.DataFrame(columns=["run_date","detections"])
@@ -76,16 +166,51 @@ def adoption_by_date(df: pd.DataFrame) -> pd.DataFrame:
             .groupby("run_date").size()
             .reset_index(name="detections"))
 
+@_agg_cache
 def exposure_counts(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty or "exposure_flags" not in df.columns:
         return pd.DataFrame(columns=["flag","count"])
-    flags = []
-    for row in df["exposure_flags"]:
-        for f in (row or []):
-            flags.append(f)
-    s = pd.Series(flags)
-    if s.empty:
+    flags = pc.drop_null(pc.list_flatten(pa.array(df["exposure_flags"])))
+    if len(flags) == 0:
         return pd.DataFrame(columns=["flag","count"])
-    out = s.value_counts().reset_index()
-    out.columns = ["flag","count"]
-    return out
+    vc = pc.value_counts(flags)
+    out = pd.DataFrame({"flag": vc.field("values").to_pandas(), "count": vc.field("counts").to_pandas()})
+    return out.sort_values("count", ascending=False, kind="stable", ignore_index=True)
+
+@_agg_cache
+def outcome_by_day(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty or "run_date" not in df.columns or "outcome" not in df.columns:
+        return pd.DataFrame(columns=["run_date","outcome","count"])
+    return (df.groupby(["run_date","outcome"], observed=True).size()
+            .reset_index(name="count"))
+
+@_agg_cache
+def status_counts(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty or "status" not in df.columns:
+        return pd.DataFrame(columns=["status","count"])
+    # status is already nullable Int16, so missing values are counted as-is
+    return df["status"].value_counts(dropna=False).rename_axis("status").reset_index(name="count")
+
+@_agg_cache
+def tld_counts(df: pd.DataFrame, top: int = 20) -> pd.DataFrame:
+    if df.empty or "tld" not in df.columns:
+        return pd.DataFrame(columns=["tld","count"])
+    return (df[(df.get("has_manifest", False) == True) & df["tld"].notna()]
+            .groupby("tld", observed=True).size().reset_index(name="count")
+            .sort_values("count", ascending=False).head(top))
+
+@_agg_cache
+def attempts_by_day(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty or "run_date" not in df.columns:
+        return pd.DataFrame(columns=["run_date","attempts"])
+    return df.groupby("run_date").size().reset_index(name="attempts")
+
+@_agg_cache
+def latency_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """Five-number summary per latency metric, for a pre-computed boxplot."""
+    lat_cols = [c for c in ["ttfb_ms","total_ms"] if c in df.columns]
+    if df.empty or not lat_cols:
+        return pd.DataFrame(columns=["metric","min","q1","median","q3","max"])
+    q = df[lat_cols].quantile([0.0, 0.25, 0.5, 0.75, 1.0])
+    q.index = ["min","q1","median","q3","max"]
+    return q.T.rename_axis("metric").reset_index().dropna()
@@ -1,7 +1,8 @@
 from __future__ import annotations
-import hashlib, os
+import hashlib, os, re
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
 
 AGG_ONLY = bool(st.secrets.get("privacy", {}).get("PUBLIC_AGGREGATES_ONLY", True))
 _SALT = st.secrets.get("privacy", {}).get("SALT") or os.environ.get("MCP_TRENDS_SALT") or os.urandom(16).hex()
@@ -13,19 +14,46 @@ SENSITIVE_COLUMNS = {
     "etag", "last_modified", "sha256"
 }
 
-def sanitize_df(df: pd.DataFrame) -> pd.DataFrame:
+# URLs or bare domain names, matched in a single pass
+_SCRUB_RE = re.compile(r"(https?://\S+)|\b(?:[A-Za-z0-9-]+\.)+[A-Za-z]{2,}\b")
+
+def sanitize_df(df: pd.DataFrame, scrub_strings: bool = True) -> pd.DataFrame:
+    """Drop identifier columns and redact URLs/domains from string columns.
+
+    Pass scrub_strings=False only when every remaining column is known to be
+    URL-free (enums, numbers, dates), to skip the regex pass.
+    """
     if df is None or df.empty:
         return df
-    out = df.copy()
-    # Drop known identifiers
-    out = out.drop(columns=[c for c in out.columns if c in SENSITIVE_COLUMNS], errors="ignore")
-    # Scrub any string that might contain a URL or domain
-    for c in out.columns:
-        if out[c].dtype == "object":
-            out[c] = out[c].astype(str)
-            out[c] = out[c].str.replace(r"(https?://\S+)", "[redacted]", regex=True)
-            out[c] = out[c].str.replace(r"\b([A-Za-z0-9-]+\.)+[A-Za-z]{2,}\b", "[redacted]", regex=True)
-    return out
+    # Drop known identifiers (no up-front copy of the whole frame)
+    out = df.drop(columns=[c for c in df.columns if c in SENSITIVE_COLUMNS], errors="ignore")
+    if not scrub_strings:
+        return out
+    # Scrub every column that can carry text; values of any type are stringified first
+    scrubbed = {
+        c: _scrub(out[c]) for c in out.columns
+        if _is_text(out[c].dtype)
+        and not (out[c].dtype == object and pd.api.types.infer_dtype(out[c], skipna=True) in _NON_TEXT)
+    }
+    return out.assign(**scrubbed) if scrubbed else out
+
+def _is_text(dtype) -> bool:
+    if isinstance(dtype, pd.CategoricalDtype):
+        return True
+    if isinstance(dtype, pd.ArrowDtype) and pa.types.is_list(dtype.pyarrow_dtype):
+        return False  # Arrow list columns (flags/caps) hold enum-like tokens
+    return pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)
+
+# infer_dtype results that guarantee an object column holds no str at all (e.g. run_date)
+_NON_TEXT = {"date", "datetime", "datetime64", "time", "boolean", "integer", "floating", "decimal", "empty"}
+
+def _scrub(s: pd.Series) -> pd.Series:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # scrub the (few) categories rather than every row; redaction may merge some
+        cats = s.cat.categories
+        clean = _scrub(pd.Series(cats.astype(object), index=cats))
+        return s.map(clean.to_dict()).astype("category")
+    return s.astype("string").str.replace(_SCRUB_RE, "[redacted]", regex=True)
 
 def aggregates_banner():
     if AGG_ONLY:
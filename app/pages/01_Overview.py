@@ -1,10 +1,10 @@
 import streamlit as st, altair as alt
-from lib.data import load_scans, adoption_by_date
+from lib.data import load_scans, adoption_by_date, tld_counts
 
 st.set_page_config(page_title="Overview · MCP Server Trends", page_icon="📊", layout="wide")
 st.title("Adoption Overview")
 
-df = load_scans()
+df = load_scans(columns=("run_ts", "run_date", "has_manifest", "outcome", "tld"))
 if df.empty:
     st.info("No data found. Put JSONL files under data/runs/YYYY-MM-DD/scan_results.jsonl")
     st.stop()
@@ -39,9 +39,7 @@ else:
 # TLD distribution (aggregated)
 st.subheader("TLD distribution (detections only)")
 if "tld" in df.columns:
-    tld_df = (df[(df.get("has_manifest", False) == True) & df["tld"].notna()]
-              .groupby("tld").size().reset_index(name="count")
-              .sort_values("count", ascending=False).head(20))
+    tld_df = tld_counts(df)
     if not tld_df.empty:
         bar = (
             alt.Chart(tld_df)
@@ -4,7 +4,7 @@ from lib.data import load_scans, exposure_counts
 st.set_page_config(page_title="Exposure Risk · MCP Server Trends", page_icon="🛡️", layout="wide")
 st.title("Exposure Risk (Aggregated)")
 
-df = load_scans()
+df = load_scans(columns=("run_ts", "has_manifest", "exposure_flags", "auth"))
 if df.empty:
     st.info("No data found.")
     st.stop()
@@ -29,7 +29,9 @@ else:
 # Auth distribution (aggregated)
 st.subheader("Auth modes")
 if "auth" in df.columns:
-    auth_df = df[df.get("has_manifest", False) == True]["auth"].value_counts().reset_index()
+    # auth is categorical: drop categories that never occur among detections
+    auth_df = df[df.get("has_manifest", False) == True]["auth"].value_counts()
+    auth_df = auth_df[auth_df > 0].reset_index()
     auth_df.columns = ["auth","count"]
     if not auth_df.empty:
         pie = (
@@ -1,10 +1,10 @@
 import streamlit as st, altair as alt
-from lib.data import load_scans, adoption_by_date
+from lib.data import load_scans, adoption_by_date, outcome_by_day
 
 st.set_page_config(page_title="Time Series · MCP Server Trends", page_icon="📈", layout="wide")
 st.title("Time Series")
 
-df = load_scans()
+df = load_scans(columns=("run_ts", "run_date", "has_manifest", "outcome"))
 if df.empty:
     st.info("No data found.")
     st.stop()
@@ -25,8 +25,7 @@ else:
 
 st.subheader("Outcome distribution by day")
 if "run_date" in df.columns and "outcome" in df.columns:
-    cmp = (df.groupby(["run_date","outcome"]).size()
-           .reset_index(name="count"))
+    cmp = outcome_by_day(df)
     if not cmp.empty:
         chart = (
             alt.Chart(cmp)
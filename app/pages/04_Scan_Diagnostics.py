@@ -1,10 +1,10 @@
 import streamlit as st, altair as alt, pandas as pd
-from lib.data import load_scans
+from lib.data import load_scans, status_counts, latency_stats, attempts_by_day
 
 st.set_page_config(page_title="Scan Diagnostics · MCP Server Trends", page_icon="🧪", layout="wide")
 st.title("Scan Diagnostics (Aggregated)")
 
-df = load_scans()
+df = load_scans(columns=("run_ts", "run_date", "status", "ttfb_ms", "total_ms"))
 if df.empty:
     st.info("No data found.")
     st.stop()
@@ -12,8 +12,7 @@ if df.empty:
 # HTTP status distribution (aggregated)
 st.subheader("HTTP status distribution")
 if "status" in df.columns:
-    s = df["status"].fillna(-1).astype(int).value_counts().reset_index()
-    s.columns = ["status","count"]
+    s = status_counts(df)
     chart = alt.Chart(s).mark_bar().encode(
         x=alt.X("status:N", sort="-y"),
         y="count:Q",
@@ -24,18 +23,21 @@ if "status" in df.columns:
 
 # Latency distributions (aggregated)
 st.subheader("Latency (TTFB / Total)")
-lat_cols = [c for c in ["ttfb_ms","total_ms"] if c in df.columns]
-melted = df.melt(value_vars=lat_cols, var_name="metric", value_name="ms").dropna()
-if not melted.empty:
-    box = alt.Chart(melted).mark_boxplot().encode(
-        x=alt.X("metric:N", title="Metric"),
-        y=alt.Y("ms:Q", title="Milliseconds"),
-        tooltip=["metric","ms"]
-    ).properties(height=300)
+lat = latency_stats(df)
+if not lat.empty:
+    # Boxplot drawn from pre-computed quantiles: whisker rule, q1-q3 bar, median tick
+    base = alt.Chart(lat).encode(x=alt.X("metric:N", title="Metric"))
+    whiskers = base.mark_rule().encode(y=alt.Y("min:Q", title="Milliseconds"), y2="max:Q")
+    boxes = base.mark_bar(size=40).encode(
+        y="q1:Q", y2="q3:Q",
+        tooltip=["metric","min","q1","median","q3","max"]
+    )
+    medians = base.mark_tick(color="white", size=40).encode(y="median:Q")
+    box = (whiskers + boxes + medians).properties(height=300)
     st.altair_chart(box, use_container_width=True)
 
 # Attempts per day (aggregated)
 st.subheader("Attempts per day")
 if "run_date" in df.columns:
-    per_day = df.groupby("run_date").size().reset_index(name="attempts")
+    per_day = attempts_by_day(df)
     st.bar_chart(per_day.set_index("run_date"))
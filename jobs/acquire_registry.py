@@ -2,62 +2,90 @@
 Fetch MCP registry seeds from PulseMCP REST API and write a JSONL file.
 
 Usage:
-  uv run src/acquire_registry.py \
+  uv run jobs/acquire_registry.py \
     --out data/runs/2025-09-06/registry_seeds.jsonl
 
 Optional:
-  uv run src/acquire_registry.py \
+  uv run jobs/acquire_registry.py \
     --query "image" \
     --count-per-page 5000 \
     --out data/runs/2025-09-06/registry_seeds.jsonl
 """
 from __future__ import annotations
 import argparse
-import json
 import pathlib
 import logging
+import sys
 import time
-from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import urlsplit
 
 import httpx
-from app.common import ensure_dir, now_iso, write_jsonl
+import orjson
+from app.common import ensure_dir, now_iso
 
 BASE_URL = "https://api.pulsemcp.com/v0beta/servers"
 UA = "mcp-server-trends/0.1 (+https://github.com/phunold/MCP-server-trends)"
+# every request goes to the same API host: keep one h2 connection warm and multiplex on it
+REGISTRY_LIMITS = httpx.Limits(max_connections=4, max_keepalive_connections=4, keepalive_expiry=30.0)
 
+MIN_REQUEST_INTERVAL = 1 / 20  # 20 rps documented
+_last_request = 0.0  # monotonic start of the previous API request
+
+@lru_cache(maxsize=8192)  # many remotes share the same url_direct
 def hostname_from_url(u: str | None) -> str | None:
     if not u:
         return None
     try:
-        netloc = urlparse(u).netloc
+        netloc = urlsplit(u).netloc
         return netloc.split("@")[-1].split(":")[0] if netloc else None
     except Exception:
         return None
 
-def iter_servers():
-    """Yield server objects across pages using the 'next' URL."""
+def _fetch_page(client: httpx.Client, url: str, params: dict | None = None) -> dict:
+    global _last_request
+    # be polite vs. rate limits, but only wait out what is left of the minimum interval
+    # since the previous request (a slow response or slow consumer already used it up)
+    wait = _last_request + MIN_REQUEST_INTERVAL - time.monotonic()
+    if wait > 0:
+        time.sleep(wait)
+    _last_request = time.monotonic()
+    logging.info(f"Fetching {url}…")
+    r = client.get(url, params=params)
+    r.raise_for_status()
+    # straight from the response bytes: no text decode, and orjson builds the dicts in C
+    return orjson.loads(r.content)
+
+def iter_servers(query: str | None = None, count_per_page: int | None = None):
+    """Yield server objects across pages using the 'next' URL.
+
+    query/count_per_page go on the first request only; the API carries them in 'next'.
+    """
     
     # log BASE_URL
     logging.info(f"PulseMCP API base url: {BASE_URL}")
-    next_url = BASE_URL
-
-    with httpx.Client(follow_redirects=True, headers={"User-Agent": UA}, timeout=20.0) as client:
-        while next_url:
-            logging.info(f"Fetching {next_url}…")
-            r = client.get(next_url)
-            r.raise_for_status()
-            data = r.json()
-            for s in data.get("servers", []):
-                yield s
+
+    # One page is always in flight on a background thread while the caller consumes the
+    # current one, so network round trips overlap with row processing
+    with httpx.Client(http2=True, limits=REGISTRY_LIMITS, follow_redirects=True,
+                      headers={"User-Agent": UA}, timeout=20.0) as client, \
+            ThreadPoolExecutor(max_workers=1) as pool:
+        params = {k: v for k, v in (("query", query), ("count_per_page", count_per_page)) if v is not None}
+        pending = pool.submit(_fetch_page, client, BASE_URL, params or None)
+        while pending is not None:
+            data = pending.result()
             next_url = data.get("next")
-            # be polite vs. rate limits (20 rps / 200 rpm documented)
-            time.sleep(0.05)
+            pending = pool.submit(_fetch_page, client, next_url) if next_url else None
+            yield from data.get("servers", [])
     
         logging.info(f"Finished iter_servers: no more pages.")
 
 def main():
     ap = argparse.ArgumentParser(description="Acquire registry seeds from PulseMCP API.")
     ap.add_argument("--out", type=pathlib.Path, required=True, help="Output JSONL file for seeds.")
+    ap.add_argument("--query", help="Only servers matching this search term.")
+    ap.add_argument("--count-per-page", type=int, help="Page size requested from the API (max 5000).")
     args = ap.parse_args()
 
     # format logging to include timestamp
@@ -65,49 +93,60 @@ def main():
 
     ensure_dir(args.out.parent)
     logging.info(f"Fetching registry seeds from PulseMCP API...")
-    rows = []
+    count_rows = 0
     count_primary = 0
     count_remotes = 0
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    fetched_at = now_iso()  # one timestamp for the whole acquisition run
+    host_of = hostname_from_url
 
-    for s in iter_servers():
-        # log s for debugging
-        logging.debug(f"Server entry: {json.dumps(s, indent=2)}")
-
-        # Remote endpoints may include direct connect URLs; extract hostnames
-        remotes = s.get("remotes") or []
-        remote_hosts = []
-        for r in remotes:
-            h = hostname_from_url(r.get("url_direct"))
-            if h:
-                remote_hosts.append((h, r.get("transport"), r.get("authentication_method"), r.get("cost"), r.get("url_direct")))
-
-        # calculate some stats for fun
-        count_primary += 1
-        count_remotes += len(remote_hosts)
-
-        # skip if no remote_hosts found
-        if not remote_hosts:
-            continue
-
-        # Build rows: one per discovered remote mcp host
-        base_row = {
-            "name": s.get("name") or "",
-            "homepage": s.get("url") or s.get("external_url") or "",
-        }
-        for host, transport, auth, cost, url_direct in remote_hosts:
-            rows.append({
-                **base_row,
-                "target": host,
-                "remote_transport": transport,
-                "remote_auth": auth,
-                "remote_cost": cost,
-                "url_direct": url_direct,
-                "fetched_at": now_iso(),
-            })
-
-    # finally, write out the results and log some stats
-    write_jsonl(args.out, rows)
-    logging.info(f"Fetched {len(rows)} seeds from {count_primary} primary hosts and {count_remotes} remote endpoints. Output written to: {args.out}")
+    try:
+        # Rows are written as they are built instead of being collected for one big write
+        with args.out.open("ab") as out:
+            for s in iter_servers(args.query, args.count_per_page):
+                # log s for debugging (only pay for the pretty-print when debug logging is on)
+                if debug:
+                    logging.debug(f"Server entry: {orjson.dumps(s, option=orjson.OPT_INDENT_2).decode()}")
+
+                # Remote endpoints may include direct connect URLs; extract hostnames
+                # (entries without a string url_direct are skipped before any parsing;
+                # the memoized host_of would raise on unhashable list/dict values)
+                remote_hosts = [
+                    (h, r.get("transport"), r.get("authentication_method"), r.get("cost"), u)
+                    for r in s.get("remotes") or []
+                    if isinstance(u := r.get("url_direct"), str) and (h := host_of(u))
+                ]
+
+                # calculate some stats for fun
+                count_primary += 1
+                count_remotes += len(remote_hosts)
+
+                # skip if no remote_hosts found
+                if not remote_hosts:
+                    continue
+
+                # Build rows: one per discovered remote mcp host
+                base_row = {
+                    "name": s.get("name") or "",
+                    "homepage": s.get("url") or s.get("external_url") or "",
+                }
+                for host, transport, auth, cost, url_direct in remote_hosts:
+                    row = base_row.copy()
+                    row["target"] = host
+                    row["remote_transport"] = transport
+                    row["remote_auth"] = auth
+                    row["remote_cost"] = cost
+                    row["url_direct"] = url_direct
+                    row["fetched_at"] = fetched_at
+                    out.write(orjson.dumps(row) + b"\n")
+                    count_rows += 1
+    except httpx.HTTPError as e:
+        # keep what was written so far, but fail the job so a partial seed list is noticed
+        logging.error(f"Registry fetch failed after {count_primary} servers ({count_rows} seeds written): {e}")
+        sys.exit(1)
+
+    # finally, log some stats
+    logging.info(f"Fetched {count_rows} seeds from {count_primary} primary hosts and {count_remotes} remote endpoints. Output written to: {args.out}")
     
 if __name__ == "__main__":
     main()
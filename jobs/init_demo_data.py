@@ -1,10 +1,11 @@
 from __future__ import annotations
 import argparse
 import datetime as dt
-import json
 import pathlib
 from typing import Iterable
 
+import orjson
+
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 TESTS_DIR = ROOT / "tests"
@@ -16,22 +17,21 @@ def ensure_dir(p: pathlib.Path) -> None:
 
 
 def read_jsonl(path: pathlib.Path) -> Iterable[dict]:
-    with path.open("r", encoding="utf-8") as f:
+    with path.open("rb") as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
             try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError:
                 continue
 
 
 def write_jsonl(path: pathlib.Path, rows: Iterable[dict]) -> None:
     ensure_dir(path.parent)
-    with path.open("w", encoding="utf-8") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    with path.open("wb") as f:
+        f.write(b"".join(orjson.dumps(r) + b"\n" for r in rows))
 
 
 def today_str() -> str:
@@ -5,11 +5,15 @@ Usage:
   python -m report --run-dir data/runs/2025-09-06 --out reports/2025-09-06/index.html
 """
 from __future__ import annotations
-import argparse, html, json, pathlib
+import argparse, pathlib
+from typing import Iterable
 from statistics import mean
-from app.common import ensure_dir, read_jsonl
+from app.common import ANON_FLAG, DANGEROUS_FLAG, ensure_dir, read_jsonl
 
-TEMPLATE = """<!doctype html>
+# The page is rendered as head + rows + tail; the head is an f-string, compiled once with
+# the module instead of a format string parsed on every render
+def render_head(date: str, total: int, hits: int, https_hits: int, anon: int, dangerous: int) -> str:
+    return f"""<!doctype html>
 <html><head>
   <meta charset="utf-8"/>
   <title>MCP Server Trends — {date}</title>
@@ -31,19 +35,45 @@ TEMPLATE = """<!doctype html>
 <table>
   <thead><tr><th>Domain</th><th>Status</th><th>URL</th><th>Auth</th><th>Exposure</th><th>Bytes</th></tr></thead>
   <tbody>
-    {rows}
+    """
+
+TAIL = """
   </tbody>
 </table>
 
 </body></html>
 """
 
-def summarize(rows: list[dict]) -> dict:
-    total = len(rows)
-    hits = sum(1 for r in rows if r.get("status")==200 and r.get("has_manifest"))
-    https_hits = sum(1 for r in rows if r.get("status")==200 and r.get("has_manifest") and str(r.get("url","")).startswith("https://"))
-    anon = sum(1 for r in rows if "anonymous_access" in (r.get("exposure_flags") or []))
-    dangerous = sum(1 for r in rows if "dangerous_tools" in (r.get("exposure_flags") or []))
+# Same replacements as html.escape(quote=True), applied in a single C-level pass
+_ESC = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#x27;"})
+
+def render_row(r: dict) -> str:
+    expos = ",".join(r.get("exposure_flags") or [])
+    return (
+        f"<tr><td>{r.get('domain','').translate(_ESC)}</td>"
+        f"<td>{r.get('status')}</td>"
+        f"<td><code>{r.get('url','').translate(_ESC)}</code></td>"
+        f"<td>{(r.get('auth') or '').translate(_ESC)}</td>"
+        f"<td>{expos.translate(_ESC)}</td>"
+        f"<td>{r.get('bytes') or ''}</td></tr>"
+    )
+
+def summarize(rows: Iterable[dict], sample: list[dict] | None = None, sample_size: int = 100) -> dict:
+    """Count stats in a single pass over rows, optionally keeping the first sample_size in sample."""
+    total = hits = https_hits = anon = dangerous = 0
+    for r in rows:
+        total += 1
+        if sample is not None and len(sample) < sample_size:
+            sample.append(r)
+        if r.get("status")==200 and r.get("has_manifest"):
+            hits += 1
+            if str(r.get("url","")).startswith("https://"):
+                https_hits += 1
+        flags = r.get("exposure_flags") or []
+        if ANON_FLAG in flags:
+            anon += 1
+        if DANGEROUS_FLAG in flags:
+            dangerous += 1
     return dict(total=total, hits=hits, https_hits=https_hits, anon=anon, dangerous=dangerous)
 
 def main():
@@ -53,25 +83,17 @@ def main():
     args = ap.parse_args()
 
     scan_file = args.run_dir / "scan_results.jsonl"
-    rows = list(read_jsonl(scan_file)) if scan_file.exists() else []
-    stats = summarize(rows)
-
-    sample = rows[:100]
-    tr_rows = []
-    for r in sample:
-        expos = ",".join(r.get("exposure_flags") or [])
-        tr_rows.append(
-            f"<tr><td>{html.escape(r.get('domain',''))}</td>"
-            f"<td>{r.get('status')}</td>"
-            f"<td><code>{html.escape(r.get('url',''))}</code></td>"
-            f"<td>{html.escape(r.get('auth') or '')}</td>"
-            f"<td>{html.escape(expos)}</td>"
-            f"<td>{r.get('bytes') or ''}</td></tr>"
-        )
+    # stream the file: only the stats and the first 100 rows are held in memory
+    sample: list[dict] = []
+    stats = summarize(read_jsonl(scan_file) if scan_file.exists() else [], sample)
 
     ensure_dir(args.out.parent)
-    html_out = TEMPLATE.format(date=args.run_dir.name, rows="\n".join(tr_rows), **stats)
-    args.out.write_text(html_out, encoding="utf-8")
+    # Write the page head, then each row as it is rendered, then the tail; the full
+    # document is never assembled in memory; each piece is encoded to UTF-8 exactly once
+    with args.out.open("wb") as f:
+        f.write(render_head(args.run_dir.name, **stats).encode())
+        f.writelines(((b"\n" if i else b"") + render_row(r).encode()) for i, r in enumerate(sample))
+        f.write(TAIL.encode())
     print(f"Wrote report → {args.out}")
 
 if __name__ == "__main__":
@@ -24,47 +24,71 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-import json
 import logging
 import pathlib
 import re
+from collections import defaultdict
+from functools import lru_cache
 from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
 
 import httpx
+import orjson
 
 from app.common import (
     ensure_dir,
+    jsonl_writer,
     now_iso,
-    write_jsonl,
-    HTTPX_LIMITS,
-    HTTPX_TIMEOUT,
-    USER_AGENT,
+    put_row,
+    run_async,
+    scan_client,
 )
 
 
 # Heuristic set of dangerous tool name fragments (lowercased matching)
-DANGEROUS_PATTERNS = [
-    r"\bwrite\b", r"\bdelete\b", r"\bremove\b", r"\bchmod\b", r"\bchown\b",
-    r"shell", r"exec", r"spawn", r"process", r"sudo", r"system",
-    r"http", r"fetch", r"curl", r"request",
-    r"docker", r"kube", r"kubectl",
-    r"git", r"ssh",
-]
-_DANGEROUS_RE = re.compile("|".join(DANGEROUS_PATTERNS), re.IGNORECASE)
+DANGEROUS_WORDS = ["write", "delete", "remove", "chmod", "chown"]  # whole words only
+DANGEROUS_SUBSTRINGS = (
+    "shell", "exec", "spawn", "process", "sudo", "system",
+    "http", "fetch", "curl", "request",
+    "docker", "kube",  # also covers kubectl
+    "git", "ssh",
+)
+_DANGEROUS_WORD_RE = re.compile(r"\b(?:%s)\b" % "|".join(DANGEROUS_WORDS))
+_dangerous_word_search = _DANGEROUS_WORD_RE.search  # bound once, not per name
+
+
+@lru_cache(maxsize=16384)
+def is_dangerous_name(name: str) -> bool:
+    # Plain substring checks beat a big regex alternation; tool names repeat across
+    # servers running the same software, so verdicts are memoized
+    low = name.lower()
+    return any(s in low for s in DANGEROUS_SUBSTRINGS) or _dangerous_word_search(low) is not None
 
 
 def load_scan_rows(scan_file: pathlib.Path) -> Iterable[Dict[str, Any]]:
     if not scan_file.exists():
         return []
-    with scan_file.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
+    with scan_file.open("rb") as f:
+        # Read 1 MiB blocks and split on newlines ourselves; the partial last line carries over
+        buf = b""
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                break
+            lines = (buf + chunk).split(b"\n")
+            buf = lines.pop()
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+        if buf.strip():
             try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
-                continue
+                yield orjson.loads(buf)
+            except orjson.JSONDecodeError:
+                pass
 
 
 def extract_endpoints(row: Dict[str, Any]) -> List[str]:
@@ -75,50 +99,50 @@ def extract_endpoints(row: Dict[str, Any]) -> List[str]:
     - { "endpoints": ["https://...", ...] }
     - { "remotes": [{"endpoint": "..."} or {"url": "..."}] }
     """
-    eps: List[str] = []
-    m = row.get("manifest_sample") or {}
+    m = row.get("manifest_sample")
     if not isinstance(m, dict):
-        return eps
+        return []
+    get = m.get
 
-    ep = m.get("endpoint")
+    eps: List[str] = []
+    ep = get("endpoint")
     if isinstance(ep, str) and ep:
         eps.append(ep)
 
-    epl = m.get("endpoints")
+    epl = get("endpoints")
     if isinstance(epl, list):
-        for e in epl:
-            if isinstance(e, str) and e:
-                eps.append(e)
+        eps += [e for e in epl if isinstance(e, str) and e]
 
-    remotes = m.get("remotes")
+    remotes = get("remotes")
     if isinstance(remotes, list):
         for r in remotes:
             if isinstance(r, dict):
+                rget = r.get
                 for k in ("endpoint", "url", "url_direct"):
-                    val = r.get(k)
+                    val = rget(k)
                     if isinstance(val, str) and val:
                         eps.append(val)
 
     # De-duplicate while preserving order
-    seen = set()
-    out: List[str] = []
-    for e in eps:
-        if e not in seen:
-            seen.add(e)
-            out.append(e)
-    return out
+    return list(dict.fromkeys(eps))
 
 
 def classify_tools(tools: List[Dict[str, Any]]) -> Tuple[int, int, List[str]]:
-    names: List[str] = []
-    for t in tools or []:
-        name = t.get("name") if isinstance(t, dict) else None
-        if isinstance(name, str):
-            names.append(name)
-    danger = [n for n in names if _DANGEROUS_RE.search(n or "")]
+    names = [n for t in tools or [] if isinstance(t, dict) and isinstance(n := t.get("name"), str)]
+    danger = [n for n in names if is_dangerous_name(n)]
     return len(names), len(danger), danger[:20]  # cap list for size/privacy
 
 
+MAX_RPC_BYTES = 262144  # 256 KiB; larger JSON-RPC responses are abandoned
+PER_HOST_CONCURRENCY = 2  # probes in flight per endpoint host; shared hosting rate-limits bursts
+
+# Pre-encoded request bodies for the fixed, parameterless probe calls
+_PROBE_BODIES = {
+    m: orjson.dumps({"jsonrpc": "2.0", "id": 1, "method": m, "params": {}})
+    for m in ("tools/list", "prompts/list", "resources/list")
+}
+
+
 async def jsonrpc_post(
     client: httpx.AsyncClient,
     url: str,
@@ -128,16 +152,24 @@ async def jsonrpc_post(
     request_id: int = 1,
 ) -> Tuple[int, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
     """Make a JSON-RPC POST request. Returns (status_code, result, error)."""
-    body = {"jsonrpc": "2.0", "id": request_id, "method": method}
-    if params is not None:
-        body["params"] = params
+    content = _PROBE_BODIES.get(method) if params == {} and request_id == 1 else None
+    if content is None:
+        body = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            body["params"] = params
+        content = orjson.dumps(body)
     try:
-        r = await client.post(url, json=body)
-        status = r.status_code
+        async with client.stream("POST", url, content=content) as r:
+            status = r.status_code
+            raw = bytearray()
+            async for chunk in r.aiter_bytes():
+                raw += chunk
+                if len(raw) > MAX_RPC_BYTES:
+                    return status, None, {"code": None, "message": "response too large"}
         data = None
         try:
-            data = r.json()
-        except Exception:
+            data = orjson.loads(raw)
+        except orjson.JSONDecodeError:
             return status, None, {"code": None, "message": "non-json response"}
         if isinstance(data, dict):
             if "error" in data:
@@ -177,6 +209,8 @@ async def probe_endpoint(client: httpx.AsyncClient, domain: str, endpoint: str,
         code = (error or {}).get("code")
         if code in (401, 403, -32001):  # heuristic unauthorized codes
             accepts_anonymous = False
+    # only counts and names are kept; free the parsed catalog before probing again
+    result = tools = None
 
     # Opportunistic follow-up probes if first call succeeded anonymously
     if rpc_ok and accepts_anonymous:
@@ -186,6 +220,7 @@ async def probe_endpoint(client: httpx.AsyncClient, domain: str, endpoint: str,
             prompts = res2.get("prompts")
             if isinstance(prompts, list):
                 prompts_count = len(prompts)
+        res2 = prompts = None
         # resources/list
         s3, res3, _ = await jsonrpc_post(client, endpoint, "resources/list", params={})
         if s3 == 200 and isinstance(res3, dict):
@@ -214,28 +249,31 @@ async def probe_endpoint(client: httpx.AsyncClient, domain: str, endpoint: str,
 async def worker(tasks: List[Tuple[str, str, str]], out_path: pathlib.Path, concurrency: int = 64) -> None:
     ensure_dir(out_path.parent)
     sem = asyncio.Semaphore(concurrency)
-    rows: List[Dict[str, Any]] = []
+    rows: asyncio.Queue = asyncio.Queue(maxsize=4096)
+    writer = asyncio.create_task(jsonl_writer(out_path, rows, flush_every=500))
+    # later probes of a busy host wait here and then reuse its warm pooled connection
+    host_sems: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(PER_HOST_CONCURRENCY))
 
-    async with httpx.AsyncClient(
-        limits=HTTPX_LIMITS,
-        transport=httpx.AsyncHTTPTransport(retries=0),
-        http2=False,
-        headers={"User-Agent": USER_AGENT, "Content-Type": "application/json"},
-        follow_redirects=True,
-        timeout=HTTPX_TIMEOUT,
-    ) as client:
+    async with scan_client(concurrency, headers={"Content-Type": "application/json"}) as client:
 
         async def run_probe(domain: str, endpoint: str, run_ts: str):
-            async with sem:
-                row = await probe_endpoint(client, domain, endpoint, run_ts)
-                rows.append(row)
+            try:
+                async with host_sems[urlsplit(endpoint).netloc]:
+                    row = await probe_endpoint(client, domain, endpoint, run_ts)
+                await put_row(rows, row, writer)
+            finally:
+                sem.release()
 
-        coros = [asyncio.create_task(run_probe(d, e, ts)) for (d, e, ts) in tasks]
-        for i in range(0, len(coros), 500):
-            chunk = coros[i : i + 500]
-            await asyncio.gather(*chunk)
-            write_jsonl(out_path, rows)
-            rows.clear()
+        try:
+            # a probe task is only created once a slot is free, so at most `concurrency` exist
+            async with asyncio.TaskGroup() as tg:
+                for d, e, ts in tasks:
+                    await sem.acquire()
+                    tg.create_task(run_probe(d, e, ts))
+        finally:
+            if not writer.done():
+                await put_row(rows, None, writer)  # tell the writer we're done
+            await writer
 
 
 def build_tasks(run_dir: pathlib.Path) -> List[Tuple[str, str, str]]:
@@ -273,7 +311,7 @@ def main():
         logging.info("No endpoints to probe. Exiting.")
         return
 
-    asyncio.run(worker(tasks, out, args.concurrency))
+    run_async(worker(tasks, out, args.concurrency))
     logging.info(f"Wrote remote scan results → {out}")
 
 
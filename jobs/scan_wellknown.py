@@ -8,17 +8,19 @@ Usage:
 
 """
 from __future__ import annotations
-import argparse, asyncio, socket, json, pathlib, sys, typing as t
-import httpx
+import argparse, asyncio, hashlib, socket, pathlib, sys, typing as t
+import httpx, orjson
 import logging
 from functools import lru_cache
 
 
-from app.common import (ScanResult, ensure_dir, now_iso, sha256_bytes, write_jsonl,
-                    DEFAULT_TIMEOUT, USER_AGENT, HTTPX_LIMITS, HTTPX_TIMEOUT)
+from app.common import (ScanResult, ensure_dir, jsonl_writer, now_iso, put_row, run_async,
+                    scan_client, DEFAULT_TIMEOUT)
 
 # check for this mcp.json file
 WELLKNOWN_MCP = "/.well-known/mcp.json"
+# quoted key prefixes, one of which any MCP manifest carries ("endpoint" also matches "endpoints")
+MANIFEST_KEYS = (b'"endpoint', b'"remotes', b'"mcp', b'"tools', b'"capabilities')
 # at a later stage could check for other paths
 # "/.well-known/mcp/manifest.json",  # alternate seen in the wild
 
@@ -44,27 +46,32 @@ DNS_TIMEOUT = 2.0  # seconds
 DNS_CONCURRENCY = 64          # <— new, keep this modest
 WWW_FALLBACK = True  # try www. if bare domain fails
 
+async def _getaddrinfo(h: str) -> list[str]:
+    infos = await asyncio.wait_for(
+        asyncio.get_running_loop().getaddrinfo(
+            h, 443,
+            family=socket.AF_UNSPEC,
+            type=socket.SOCK_STREAM,
+            proto=0,
+            flags=getattr(socket, "AI_ADDRCONFIG", 0),
+        ),
+        timeout=DNS_TIMEOUT,
+    )
+    return sorted({ai[4][0] for ai in infos})
+
+@lru_cache(maxsize=65536)
+def _resolve(h: str) -> asyncio.Future:
+    # one lookup task per host for the whole run; repeat and concurrent callers await
+    # the same result (failures included) instead of hitting getaddrinfo again
+    return asyncio.ensure_future(_getaddrinfo(h))
+
 async def pick_host_for_http(domain: str) -> tuple[str, list[str]]:
     """
     Return (host_used, ip_list) if resolvable. Tries apex, then www.<apex> (optional).
     Raises the last exception if neither resolves.
     """
-    loop = asyncio.get_running_loop()
     host = domain.strip().lower().strip(".")
 
-    async def _resolve(h: str) -> list[str]:
-        infos = await asyncio.wait_for(
-            loop.getaddrinfo(
-                h, 443,
-                family=socket.AF_UNSPEC,
-                type=socket.SOCK_STREAM,
-                proto=0,
-                flags=getattr(socket, "AI_ADDRCONFIG", 0),
-            ),
-            timeout=DNS_TIMEOUT,
-        )
-        return sorted({ai[4][0] for ai in infos})
-
     # try apex
     try:
         ips = await _resolve(host)
@@ -85,7 +92,7 @@ async def pick_host_for_http(domain: str) -> tuple[str, list[str]]:
 
 #async def fetch_one(client: httpx.AsyncClient, base: str) -> tuple[str, dict | None, int, dict, bytes | None]:
 async def fetch_one(client: httpx.AsyncClient, base: str):
-    # returns (url_used, manifest, status, headers, content)
+    # returns (url_used, manifest, status, headers, size, sha256, ttfb_ms, total_ms)
 
     url = f"https://{base}{WELLKNOWN_MCP}"
     
@@ -95,9 +102,13 @@ async def fetch_one(client: httpx.AsyncClient, base: str):
             t_first = asyncio.get_running_loop().time()
             content_type = r.headers.get("content-type", "").lower().split(";")[0].strip()
 
-            raw = b""
+            raw = bytearray()  # in-place appends; bytes += would recopy on every chunk
+            # hash 200 bodies while they stream in rather than in a second pass
+            hasher = hashlib.sha256() if r.status_code == 200 else None
             async for chunk in r.aiter_bytes():
                 raw += chunk
+                if hasher:
+                    hasher.update(chunk)
                 if len(raw) > 131072:  # 128kiB max
                     break
 
@@ -105,12 +116,13 @@ async def fetch_one(client: httpx.AsyncClient, base: str):
 
             manifest = None
             if r.status_code == 200:
-                body = raw.lstrip()
-                looks_like_json = body[:1] in (b"{", b"[") or "json" in content_type
-                if looks_like_json and raw:
+                looks_like_json = raw[:1024].lstrip()[:1] in (b"{", b"[") or "json" in content_type
+                # cheap byte sniff: JSON that names none of the manifest keys (error pages,
+                # consent blobs, ...) isn't an MCP manifest, so don't pay for parsing it
+                if looks_like_json and raw and any(k in raw for k in MANIFEST_KEYS):
                     try:
-                        manifest = json.loads(raw.decode("utf-8", "replace"))
-                    except json.JSONDecodeError:
+                        manifest = orjson.loads(raw)
+                    except orjson.JSONDecodeError:
                         logging.warning(f"JSONDecodeError for {url}")
                         pass
         return (
@@ -118,28 +130,27 @@ async def fetch_one(client: httpx.AsyncClient, base: str):
             manifest,
             r.status_code,
             dict(r.headers),
-            raw if r.status_code == 200 else None, # only keep body for 200 OK
+            (len(raw) or None) if r.status_code == 200 else None, # body size for 200 OK only; the buffer itself never leaves
+            hasher.hexdigest() if hasher and raw else None,
             round((t_first - t0) * 1000, 1),  # time to first byte (ttfb) in ms
             round((t_end - t0) * 1000, 1),    # total time in ms
         )
     except httpx.RequestError as e:
         logging.warning(f"RequestError for {url}: {e.args}")
-        return (url, None, 0, {}, None, None, None)
+        return (url, None, 0, {}, None, None, None, None)
 
 async def worker(domains: list[str], out_path: pathlib.Path, run_ts: str, concurrency: int = 100):
     ensure_dir(out_path.parent)
+    _resolve.cache_clear()  # cached lookup tasks belong to the previous run's event loop
     sem = asyncio.Semaphore(concurrency)
     dns_sem = asyncio.Semaphore(DNS_CONCURRENCY)
-    rows: list[dict] = []
-
-    async with httpx.AsyncClient(
-        limits=HTTPX_LIMITS,
-        transport=httpx.AsyncHTTPTransport(retries=0),
-        http2=False,    # h1 is fine for one-host-per-request scans
-        headers={"User-Agent": USER_AGENT},
-        follow_redirects=True,
-        timeout=HTTPX_TIMEOUT,
-    ) as client:
+    # caps tasks in existence (not just running) so memory stays flat on huge seed lists;
+    # sized to keep both the DNS and HTTP stages busy
+    slots = asyncio.Semaphore(concurrency + DNS_CONCURRENCY)
+    rows: asyncio.Queue = asyncio.Queue(maxsize=4096)
+    writer = asyncio.create_task(jsonl_writer(out_path, rows))
+
+    async with scan_client(concurrency) as client:
         async def scan(domain: str):
             d = domain.strip()
             try:
@@ -156,40 +167,53 @@ async def worker(domains: list[str], out_path: pathlib.Path, run_ts: str, concur
                     has_manifest=False,
                     notes=[note],
                 )
-                rows.append(sr.asdict())
+                await put_row(rows, sr.asdict(), writer)
                 return
             
             # proceed with HTTP fetch
             async with sem:
-                url_used, manifest, status, headers, content, ttfb_ms, total_ms = await fetch_one(client, host_used)
+                url_used, manifest, status, headers, size, digest, ttfb_ms, total_ms = await fetch_one(client, host_used)
                 sr = ScanResult(
                     run_ts=run_ts,
                     domain=d,
                     url=url_used or f"https://{host_used}{WELLKNOWN_MCP}",
                     status=int(status or 0),
                     has_manifest=bool(manifest),
-                    bytes=(len(content) if content else None),
+                    bytes=size,
                     etag=headers.get("etag"),
                     last_modified=headers.get("last-modified"),
-                    sha256=(sha256_bytes(content) if content else None),
+                    sha256=digest,
                     ttfb_ms=ttfb_ms,
                     total_ms=total_ms,
                     manifest_sample=(manifest if manifest else None),
                     notes=["super cool ;-)"],
                 )
-                rows.append(sr.asdict())
+                await put_row(rows, sr.asdict(), writer)
 
-        tasks = [asyncio.create_task(scan(d)) for d in domains if d.strip()]
-        # periodic flush to avoid memory blow-up
-        for i in range(0, len(tasks), 1000):
-            chunk = tasks[i:i+1000]
-            await asyncio.gather(*chunk)
-            write_jsonl(out_path, rows)
-            rows.clear()
+        async def scan_slot(domain: str):
+            try:
+                await scan(domain)
+            finally:
+                slots.release()
+
+        try:
+            async with asyncio.TaskGroup() as tg:
+                for d in domains:
+                    if d.strip():
+                        await slots.acquire()
+                        tg.create_task(scan_slot(d))
+        finally:
+            if not writer.done():
+                await put_row(rows, None, writer)  # tell the writer we're done
+            await writer
 
 def load_domains(path: pathlib.Path) -> list[str]:
+    # normalize and drop duplicates (common in merged seed lists), keeping first-seen order
     with path.open("r", encoding="utf-8") as f:
-        return [ln.strip() for ln in f if ln.strip()]
+        raw = [d for ln in f if (d := ln.strip().lower().rstrip("."))]
+    domains = list(dict.fromkeys(raw))
+    logging.info(f"Deduplicated {len(raw)} → {len(domains)} domains")
+    return domains
 
 def main():
     ap = argparse.ArgumentParser()
@@ -202,7 +226,7 @@ def main():
     domains = load_domains(args.domains)
     logging.info(f"Starting scan of {len(domains)} domains …")
 
-    asyncio.run(worker(domains, args.out, run_ts, args.concurrency))
+    run_async(worker(domains, args.out, run_ts, args.concurrency))
     logging.info(f"Scan finished → {args.out}")
 
 if __name__ == "__main__":